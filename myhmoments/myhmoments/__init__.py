@@ -1,7 +1,11 @@
+__version__ = '0.1'
+
 from .color_scales import *
 from .colors import *
 from .exceptions import *
 from .hphob_scales import *
 from .surface import *
 from .moments import *
+from .index import *
+from .cache import *
 from .__main__ import *
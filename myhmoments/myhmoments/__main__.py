@@ -11,17 +11,28 @@ First, it parses the input arguments given by the user:
 - a threshold to trim surface residues,
 - a solvent accesibility array,
 - a radius of the sphere that will define the region,
-- and a hydrophobicity scale.
+- a hydrophobicity scale,
+- a region mode (CA, side-chain centroid or atom),
+- a directory of a local index of regions, the number of similar regions to report
+  and a name for the structure in the index,
+- and a directory and maximum size of the results cache.
 
 The program wirtes 3 different files: the tab file containing the hydropathy moments,
 a bild fild with vector objects corresponding to the hydropathy moments of the x
 regions and file containing a macro for USCF-Chimera in order to better visualize
-the pdb file with the vector objects on it.
+the pdb file with the vector objects on it. When similar regions are requested, a fourth
+file (.sim) contains the most similar regions of the other structures in the index.
 
 The program executes 3 main functions imported from other modules in the package.
 First, the surface residues are fetched using the function get_surface_residues with a
 given input threshold. Then the carbon-alpha coordinates are stored with the function
 get_CA_coordinates and finally, the hydropathy moments are calculated with get_H_moments.
+In centroid and atom region modes, the atoms of the surface residues are stored with
+get_atom_arrays and the side-chain centroids are calculated from them with
+get_centroid_coordinates. In atom mode the moments are calculated with get_H_moments_atoms
+from every atom, weighted by the atomic hydrophobicity scale (Eisenberg-McLachlan).
+If a cache directory is given, the moments of a run already done with the same pdb file
+and parameters are read from the cache instead.
 
 The program can start a subprocess that will execute the macro file in order to visualize
 the results in USCF-Chimera. Once the path to the USCF-Chimera is provided in the commandline,
@@ -39,6 +50,8 @@ if __name__=="__main__":
         import myhmoments.exceptions as e
         import myhmoments.surface as s
         import myhmoments.moments as mo
+        import myhmoments.index as ix
+        import myhmoments.cache as c
 
     except ImportError as e:
         raise Exception("Failed to import %s\n" %e)
@@ -103,10 +116,63 @@ if __name__=="__main__":
     parser.add_argument('-hy', '--hyphob_scale',
                         dest = "hphob_scale",
                         action = "store",
-                        default = "Kyte_Doolitle",
+                        default = None,
                         choices = ["OMH_Sweet", "Kyte_Doolitle", "Abraham_Leo", "Bull_Breese", "Guy", "Miyazawa", "Roseman", "Wolfenden", "Eisenberg", "Hopp_Woods", "Manavalan", "Black", "Fauchere", "Janin", "Rao_Argos", "Tanford", "Welling"],
-                        help = """Hydrophobicity scale used for hydropathy moments calculations.\n
-                        Default: Eisenberg scale. """)
+                        help = """Hydrophobicity scale used for hydropathy moments calculations.
+                        Not used in atom region mode.\n
+                        Default: Kyte_Doolitle scale. """)
+
+    parser.add_argument('-m', '--region_mode',
+                        dest = "region_mode",
+                        action = "store",
+                        default = "CA",
+                        choices = ["CA", "centroid", "atom"],
+                        help = """Points used to define the regions. CA: spheres centered at the CA of
+                        the surface residues and vectors drawn to the CAs. centroid: side-chain centroids
+                        instead of CAs. atom: spheres centered at the side-chain centroids and vectors drawn
+                        to every atom, weighted by the atomic hydrophobicity scale (Eisenberg-McLachlan).
+                        The hydrophobicity scale is not used in atom mode.\n
+                        Default: CA""")
+
+    parser.add_argument('-x', '--index',
+                        dest = "index",
+                        action = "store",
+                        default = None,
+                        help = """Directory of the local index of surface regions. The regions of the
+                        input pdb file are added to the index (the directory is created if needed).""")
+
+    parser.add_argument('-k', '--similar',
+                        dest = "similar",
+                        action = "store",
+                        default = None,
+                        type = int,
+                        help = """Number (int) of the most similar regions of other structures in the
+                        index to report for each region. Requires --index.\n
+                        Results are written in a .sim file.""")
+
+    parser.add_argument('-n', '--name',
+                        dest = "name",
+                        action = "store",
+                        default = None,
+                        help = """Name of the structure in the index.\n
+                        Default: input file name followed by the first characters of its sha256.""")
+
+    parser.add_argument('-c', '--cache_dir',
+                        dest = "cache_dir",
+                        action = "store",
+                        default = None,
+                        help = """Directory of the results cache. Runs with the same input pdb file and
+                        parameters read the hydropathy moments from the cache instead of calculating them.\n
+                        Default: no cache.""")
+
+    parser.add_argument('-cs', '--cache_size',
+                        dest = "cache_size",
+                        action = "store",
+                        default = 100.0,
+                        type = float,
+                        help = """Maximum size (float) of the results cache in MB. The least recently used
+                        results are removed when it is exceeded.\n
+                        Default: 100.0""")
 
     sys.stderr.write("""CALCULATION OF HYDROPATHY MOMENTS IN LOCAL REGIONS
     ------------------------------------------------------\n""")
@@ -120,6 +186,7 @@ if __name__=="__main__":
     outfile_file = outfile_prefix+".tab"                   # Output file .tab
     outfile_moments_file = outfile_prefix+".bild"          # Output file .bild with hydropathy moments (Chimera)
     outfile_macro_file = outfile_prefix+".cmd"             # Output file .cmd with file.pdb and hydropathy moments (Chimera)
+    outfile_similar_file = outfile_prefix+".sim"           # Output file .sim with the most similar regions in the index
 
     sys.stderr.write("Output files prefix:\t%s\n" %args.outfile)
     sys.stderr.write("ACC array:\t\t%s\n" %args.acc_array)
@@ -131,20 +198,96 @@ if __name__=="__main__":
         raise e.RadiusError(args.radius)
     else:
         sys.stderr.write("Sphere radius:\t\t%s\n" %args.radius)
-    sys.stderr.write("Hydrophobicity scale:\t%s\n" %args.hphob_scale)
+    if args.region_mode == "atom":                         # Atom mode uses the atomic hydrophobicity scale
+        if args.hphob_scale is not None:
+            sys.stderr.write("WARNING: hydrophobicity scale %s is not used in atom region mode\n" %args.hphob_scale)
+        hphob_scale_name = "Eisenberg_McLachlan"
+    else:
+        if args.hphob_scale is None:
+            args.hphob_scale = "Kyte_Doolitle"
+        hphob_scale_name = args.hphob_scale
+    sys.stderr.write("Hydrophobicity scale:\t%s\n" %hphob_scale_name)
+    sys.stderr.write("Region mode:\t\t%s\n" %args.region_mode)
+    if args.index is not None:
+        sys.stderr.write("Index directory:\t%s\n" %args.index)
+    if args.similar is not None:
+        if args.index is None or args.similar<1:           # If similar regions cannot be searched, raise exception
+            raise e.SimilarError(args.similar)
+        else:
+            sys.stderr.write("Similar regions:\t%s\n" %args.similar)
+    if args.cache_dir is not None:
+        if args.cache_size<=0:                             # If cache size not correct, raise exception
+            raise e.CacheSizeError(args.cache_size)
+        else:
+            sys.stderr.write("Cache directory:\t%s (%s MB)\n" %(args.cache_dir, args.cache_size))
 
     #####################################################################
     ####                       RUN FUNCTIONS                        #####
     #####################################################################
 
-    surface_residues_number = s.get_surface_residues(filename=args.infile,
-                                                     my_acc_array=args.acc_array,
-                                                     my_threshold=args.threshold)
-    CA_dictionary = s.get_CA_coordinates(filename=args.infile,
-                                         my_set=surface_residues_number)
-    moments = mo.get_H_moments(my_dictionary=CA_dictionary,
-                               my_radius=args.radius,
-                               my_h_scale=args.hphob_scale)
+    run_parameters = {"acc_array": args.acc_array,
+                      "threshold": args.threshold,
+                      "radius": args.radius,
+                      "hphob_scale": hphob_scale_name,
+                      "region_mode": args.region_mode}
+
+    if args.cache_dir is not None or args.index is not None:
+        input_hash = c.get_file_hash(args.infile)     # Hashed once for the cache and the index
+
+    moments = None
+    if args.cache_dir is not None:
+        cache_key = c.get_cache_key(file_hash=input_hash,
+                                    my_parameters=run_parameters)
+        moments = c.get_cached_moments(cache_dir=args.cache_dir, key=cache_key)
+        if moments is not None:
+            sys.stderr.write("%s hydropathy moments read from cache.\n" %len(moments))
+
+    if moments is None:
+        surface_residues_number = s.get_surface_residues(filename=args.infile,
+                                                         my_acc_array=args.acc_array,
+                                                         my_threshold=args.threshold)
+        if args.region_mode == "CA":
+            CA_dictionary = s.get_CA_coordinates(filename=args.infile,
+                                                 my_set=surface_residues_number)
+            moments = mo.get_H_moments(my_dictionary=CA_dictionary,
+                                       my_radius=args.radius,
+                                       my_h_scale=args.hphob_scale)
+        else:
+            atom_arrays = s.get_atom_arrays(filename=args.infile,
+                                            my_set=surface_residues_number)
+            centroid_dictionary = s.get_centroid_coordinates(my_atoms=atom_arrays)
+            if args.region_mode == "centroid":
+                moments = mo.get_H_moments(my_dictionary=centroid_dictionary,
+                                           my_radius=args.radius,
+                                           my_h_scale=args.hphob_scale)
+            else:
+                moments = mo.get_H_moments_atoms(my_dictionary=centroid_dictionary,
+                                                 my_atoms=atom_arrays,
+                                                 my_radius=args.radius)
+        if args.cache_dir is not None:
+            c.store_moments(cache_dir=args.cache_dir,
+                            key=cache_key,
+                            my_moments=moments,
+                            max_size=args.cache_size*1024*1024)
+
+    if args.cache_dir is not None:
+        cache_stats = c.get_cache_stats(args.cache_dir)
+        sys.stderr.write("Cache hit rate:\t\t%.2f (%s hits, %s misses, %s results, %.2f MB)\n" %(
+                         cache_stats["hits"]/max(cache_stats["hits"] + cache_stats["misses"], 1),
+                         cache_stats["hits"], cache_stats["misses"],
+                         cache_stats["entries"], cache_stats["size"]/(1024*1024)))
+    if args.index is not None:
+        structure_name = ix.get_structure_name(filename=args.infile, file_hash=input_hash, name=args.name)
+        ix.add_to_index(index_dir=args.index,
+                        structure=structure_name,
+                        my_moments=moments,
+                        my_parameters=run_parameters)
+        if args.similar is not None:
+            similar_regions = ix.search_index(index_dir=args.index,
+                                              structure=structure_name,
+                                              my_moments=moments,
+                                              my_parameters=run_parameters,
+                                              k=args.similar)
 
     #####################################################################
     ####                       PRINT RESULTS                        #####
@@ -164,7 +307,8 @@ if __name__=="__main__":
         outfd.write("ACC array:\t%s\n" %args.acc_array)
         outfd.write("RSA threshold:\t%s\n" %args.threshold)
         outfd.write("Sphere radius:\t%s\n" %args.radius)
-        outfd.write("Hydrophobicity scale:\t%s\n\n" %args.hphob_scale)
+        outfd.write("Hydrophobicity scale:\t%s\n" %hphob_scale_name)
+        outfd.write("Region mode:\t%s\n\n" %args.region_mode)
         outfd.write("H moment\t%s\t%s\t%s\t%s\t%s\t%s\n" %("Origin(x)","Origin(y)","Origin(z)", "Vector(x)", "Vector(y)","Vector(z)"))
         count = 1
         for key, value in moments.items():
@@ -185,6 +329,15 @@ if __name__=="__main__":
         outfd_macro.write("""background solid white\ndel solvent\n~ribbon\nshow @ca\nsurface\ntransp 60,s\ncolor grey,s\n""")
         outfd_macro.write("open %s" %(outfile_moments_file))
 
+    if args.similar is not None:
+        with open(outfile_similar_file, "w") as outfd_similar:
+            outfd_similar.write("H moment\t%s\t%s\t%s\t%s\t%s\t%s\t%s\t%s\t%s\n" %("Origin(x)","Origin(y)","Origin(z)","Structure","H moment","Origin(x)","Origin(y)","Origin(z)","Distance"))
+            count = 1
+            for key, hits in zip(moments.keys(), similar_regions):
+                for hit in hits:
+                    outfd_similar.write("%8s\t%8.4f\t%8.4f\t%8.4f\t%s\t%8s\t%8.4f\t%8.4f\t%8.4f\t%8.4f\n" %(count,key[0],key[1],key[2],hit[0],hit[1],hit[2][0],hit[2][1],hit[2][2],hit[3]))
+                count+=1
+
     sys.stderr.write("Program finished!\n")
 
 
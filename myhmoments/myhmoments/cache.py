@@ -0,0 +1,197 @@
+"""
+This module keeps a local cache of the hydropathy moments calculated for previous runs.
+
+Each result is stored in the cache directory in a file named by a key computed from the
+content of the input pdb file, the parameters of the run and the version of myhmoments.
+When the same pdb file is run again with the same parameters the moments are read from
+the cache, and parsing, DSSP and the calculation of the moments are skipped.
+
+The moments are stored as plain numpy arrays (.npz files), so loading a result never
+executes code. A result that cannot be loaded is removed and counted as a miss.
+
+The cache has a maximum size. When it is exceeded, the least recently used results are
+removed. The number of hits and misses is kept in a stats file in the cache directory,
+which is only updated while holding a lock file so concurrent runs do not lose counts.
+"""
+
+try:
+    import sys
+    import os
+    import json
+    import time
+    import hashlib
+    import numpy as n
+    from myhmoments import __version__
+
+except ImportError as e:
+    raise Exception("Failed to import %s\n" %e)
+
+
+def get_file_hash(filename):
+    """
+    Returns the sha256 (hexadecimal) of the content of a file.
+    """
+    file_hash = hashlib.sha256()
+    with open(filename, "rb") as fd:
+        for block in iter(lambda: fd.read(65536), b""):
+            file_hash.update(block)
+    return file_hash.hexdigest()
+
+def get_cache_key(file_hash, my_parameters):
+    """
+    Returns the key of a run: the sha256 of the input file content (given by
+    get_file_hash) together with the parameters of the run (dictionary) and the
+    version of myhmoments.
+    """
+    key = hashlib.sha256()
+    key.update(file_hash.encode())
+    key.update(json.dumps(my_parameters, sort_keys=True).encode())
+    key.update(__version__.encode())
+    return key.hexdigest()
+
+def get_cache_entries(cache_dir):
+    """
+    Returns a list of tuples (access time, size, path) of the results stored in the cache.
+    """
+    entries = []
+    if os.path.isdir(cache_dir):
+        for filename in os.listdir(cache_dir):
+            if filename.endswith(".npz"):
+                path = os.path.join(cache_dir, filename)
+                try:
+                    entries.append((os.path.getmtime(path), os.path.getsize(path), path))
+                except FileNotFoundError: # removed by another run
+                    pass
+    return entries
+
+def read_cache_stats(cache_dir):
+    """
+    Returns a dictionary with the number of hits and misses stored in the stats file.
+    """
+    stats = {"hits": 0, "misses": 0}
+    try:
+        with open(os.path.join(cache_dir, "stats.json")) as fd:
+            stats.update(json.load(fd))
+    except (FileNotFoundError, ValueError):
+        pass
+    return stats
+
+def get_cache_stats(cache_dir):
+    """
+    Returns a dictionary with the number of hits and misses of the cache, the number
+    of results stored and their total size in bytes.
+    """
+    stats = read_cache_stats(cache_dir)
+    entries = get_cache_entries(cache_dir)
+    stats["entries"] = len(entries)
+    stats["size"] = sum(entry[1] for entry in entries)
+    return stats
+
+def update_cache_stats(cache_dir, hit, timeout=10):
+    """
+    Adds a hit (hit=True) or a miss (hit=False) to the stats file of the cache. The file
+    is read and written while holding a lock file. A lock older than timeout (seconds),
+    left by a killed run, is removed.
+    """
+    lock_file = os.path.join(cache_dir, "stats.lock")
+    start = time.time()
+    while True:
+        try:
+            os.close(os.open(lock_file, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            break
+        except FileExistsError:
+            if time.time() - start > timeout:
+                try:
+                    os.remove(lock_file)
+                except FileNotFoundError:
+                    pass
+                start = time.time()
+            time.sleep(0.01)
+
+    try:
+        stats = read_cache_stats(cache_dir)
+        if hit:
+            stats["hits"] += 1
+        else:
+            stats["misses"] += 1
+
+        tmp_file = os.path.join(cache_dir, "stats.json.%s" %os.getpid())
+        with open(tmp_file, "w") as fd:
+            json.dump(stats, fd)
+        os.replace(tmp_file, os.path.join(cache_dir, "stats.json"))
+    finally:
+        os.remove(lock_file)
+
+def get_cached_moments(cache_dir, key):
+    """
+    Returns the moments stored in the cache with the given key, or None if there are
+    not any. A result that cannot be loaded is removed. The access time of the result
+    is updated to keep track of the least recently used results.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+
+    cache_file = os.path.join(cache_dir, key + ".npz")
+    if not os.path.isfile(cache_file):
+        update_cache_stats(cache_dir, hit=False)
+        return None
+
+    try:
+        with n.load(cache_file, allow_pickle=False) as data:
+            moments = {}
+            for origin, moment, color, mean_H, number in zip(data["origins"], data["moments"], data["colors"], data["mean_H"], data["numbers"]):
+                moments[tuple(origin)] = (moment[0], moment[1], moment[2], tuple(color), mean_H, int(number))
+        os.utime(cache_file)
+    except Exception as error:
+        sys.stderr.write("Removing unreadable cache result %s: %s\n" %(cache_file, error))
+        try:
+            os.remove(cache_file)
+        except FileNotFoundError:
+            pass
+        update_cache_stats(cache_dir, hit=False)
+        return None
+
+    update_cache_stats(cache_dir, hit=True)
+    return moments
+
+def evict_cache(cache_dir, max_size):
+    """
+    Removes the least recently used results of the cache until its size is not greater
+    than max_size (bytes).
+    """
+    entries = get_cache_entries(cache_dir)
+    size = sum(entry[1] for entry in entries)
+    count = 0
+    for mtime, file_size, path in sorted(entries):
+        if size <= max_size:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        size -= file_size
+        count += 1
+
+    if count:
+        sys.stderr.write("%s results removed from cache.\n" %count)
+
+def store_moments(cache_dir, key, my_moments, max_size):
+    """
+    Stores the moments of a run in the cache with the given key and removes the least
+    recently used results if the cache is greater than max_size (bytes).
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+
+    # The arrays keep the dtype of the moments (e.g. float32 coordinates), so a cached
+    # result writes exactly the same output files as the run that stored it
+    values = list(my_moments.values())
+    cache_file = os.path.join(cache_dir, key + ".npz")
+    tmp_file = "%s.%s.tmp" %(cache_file, os.getpid())
+    with open(tmp_file, "wb") as fd:
+        n.savez(fd,
+                origins=n.array(list(my_moments.keys())).reshape(-1, 3),
+                moments=n.array([value[0:3] for value in values]).reshape(-1, 3),
+                colors=n.array([value[3] for value in values]).reshape(-1, 3),
+                mean_H=n.array([value[4] for value in values]),
+                numbers=n.array([value[5] for value in values], dtype=int))
+    os.replace(tmp_file, cache_file)
+    evict_cache(cache_dir, max_size)
@@ -37,3 +37,21 @@ class RadiusError(InputValueError):
 
     def __str__(self):
         return "Incorrect radius value: %s. Radius value x: 4.0<=x<=10.0" %(self.value)
+
+class SimilarError(InputValueError):
+    """
+    An exception is raised when the number of similar regions is smaller than 1
+    or no index directory is given to search them.
+    """
+
+    def __str__(self):
+        return "Incorrect number of similar regions: %s. Number of similar regions x: x>=1, and --index is required" %(self.value)
+
+class CacheSizeError(InputValueError):
+    """
+    An exception is raised when the maximum size of the results cache is not
+    greater than 0.
+    """
+
+    def __str__(self):
+        return "Incorrect cache size: %s. Cache size x (MB): x>0" %(self.value)
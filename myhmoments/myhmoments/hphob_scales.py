@@ -5,6 +5,10 @@ hydrophobicity scales according to http://web.expasy.org/protscale/.
 Some scales do not assign to the most hydrophobic aminoacids the most positive value. These
 scales will be assigned a reverse color scale in the color_scales module.
 
+It also contains an atomic hydrophobicity scale (atomic solvation parameters) used when the
+hydropathy moments are calculated from the atoms of the residues, and a dictionary with the
+charged atoms of each residue.
+
 """
 # Amino acid scale: Optimized matching hydrophobicity (OMH).
 # # Author(s): Sweet R.M., Eisenberg D.
@@ -182,3 +186,18 @@ hphob_scales_dict = {
 "LEU":  0.750, "LYS":  2.060, "MET": -3.850, "PHE": -1.410, "PRO": -0.530,
 "SER": -0.260, "THR": -0.450, "TRP": -1.140, "TYR":  0.130, "VAL": -0.130
 }}
+
+# Atomic scale: Atomic solvation parameters (cal/mol/A^2).
+# # Author(s): Eisenberg D., McLachlan A.D.
+# # Reference: Nature 319:199-203(1986).
+
+atomic_hphob_dict = {
+"C":  16.000, "N":  -6.000, "O":  -6.000, "S":  21.000, "O-": -24.000, "N+": -50.000
+}
+
+charged_atoms_dict = {
+"ASP": {"OD1": "O-", "OD2": "O-"},
+"GLU": {"OE1": "O-", "OE2": "O-"},
+"LYS": {"NZ": "N+"},
+"ARG": {"NH1": "N+", "NH2": "N+"}
+}
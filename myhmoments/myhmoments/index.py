@@ -0,0 +1,220 @@
+"""
+This module keeps a local index of surface regions of many structures and finds the
+regions of other structures with the most similar hydropathy moment environment.
+
+Each region (sphere) of a structure is described by rotation-invariant features that
+do not depend on the orientation of the pdb file: the module of the hydropathy moment,
+the mean hydrophobicity index of the sphere, the number of residues inside the sphere
+and the module of the moment per residue. The descriptors of every structure are stored
+in its own .npz file, so new structures can be added (or replaced) without rebuilding
+the rest of the index. The descriptors of all the structures are also kept together in
+a consolidated file, which is updated with the new or replaced structures before a
+search, so a search reads a single file.
+
+The descriptors of runs with different parameters (hydrophobicity scale, radius...) are
+not comparable, so every set of parameters has its own subdirectory in the index and
+only the structures run with the same parameters are compared.
+
+The search is an exact nearest neighbor search over the standardized descriptors of
+all the regions stored with the same parameters. The index is scanned in chunks keeping
+the k nearest regions found so far, so the memory used does not grow with the index.
+"""
+
+try:
+    import sys
+    import os
+    import re
+    import json
+    import hashlib
+    import numpy as n
+    from myhmoments.cache import get_file_hash
+
+except ImportError as e:
+    raise Exception("Failed to import %s\n" %e)
+
+
+def get_structure_name(filename, file_hash=None, name=None):
+    """
+    Returns the name used to store a structure in the index. If no name is given, it is
+    the pdb file name without path and extension followed by the first characters of the
+    sha256 of the file content (file_hash, computed if not given), so different files
+    with the same name do not replace each other.
+    """
+    if name is None:
+        if file_hash is None:
+            file_hash = get_file_hash(filename)
+        name = "%s_%s" %(os.path.splitext(os.path.basename(filename))[0], file_hash[:8])
+    return re.sub('[^A-Za-z0-9_.-]', '_', name)
+
+def get_parameters_dir(index_dir, my_parameters):
+    """
+    Returns the subdirectory of the index where the structures run with the given
+    parameters (dictionary) are stored.
+    """
+    signature = hashlib.sha256(json.dumps(my_parameters, sort_keys=True).encode()).hexdigest()[:16]
+    return os.path.join(index_dir, signature)
+
+def get_region_descriptors(my_moments):
+    """
+    Given the dictionary returned by get_H_moments, returns two arrays: the origins of
+    the regions (one row per region) and their rotation-invariant descriptors
+    (module of the moment, mean H, number of residues, module of the moment per residue).
+    """
+    origins = n.zeros((len(my_moments), 3))
+    descriptors = n.zeros((len(my_moments), 4))
+
+    for i, (key, value) in enumerate(my_moments.items()):
+        module = n.sqrt(value[0]**2 + value[1]**2 + value[2]**2)
+        origins[i] = key[0:3]
+        descriptors[i] = (module, value[4], value[5], module/value[5])
+    return origins, descriptors
+
+def write_npz(filename, **arrays):
+    """
+    Writes arrays to a .npz file atomically, so other runs never read a half-written file.
+    """
+    tmp_file = "%s.%s.tmp" %(filename, os.getpid())
+    with open(tmp_file, "wb") as fd:
+        n.savez(fd, **arrays)
+    os.replace(tmp_file, filename)
+
+def add_to_index(index_dir, structure, my_moments, my_parameters):
+    """
+    Stores the region descriptors of a structure in the subdirectory of the index for
+    the parameters of the run (dictionary). If the structure was already in the index
+    its descriptors are replaced. The consolidated file is updated by the next search.
+    """
+    parameters_dir = get_parameters_dir(index_dir, my_parameters)
+    structures_dir = os.path.join(parameters_dir, "structures")
+    os.makedirs(structures_dir, exist_ok=True)
+    if not os.path.isfile(os.path.join(parameters_dir, "parameters.json")):
+        with open(os.path.join(parameters_dir, "parameters.json"), "w") as fd:
+            json.dump(my_parameters, fd, sort_keys=True)
+
+    origins, descriptors = get_region_descriptors(my_moments)
+    write_npz(os.path.join(structures_dir, structure + ".npz"), origins=origins, descriptors=descriptors)
+    sys.stderr.write("Structure %s added to index %s (%s regions).\n" %(structure, parameters_dir, len(origins)))
+
+def load_index(index_dir, my_parameters):
+    """
+    Loads all the structures of the index run with the given parameters (dictionary).
+    Returns the structure name and the region number (as in the .tab file) of every
+    region, together with their origins and descriptors.
+
+    The regions are read from the consolidated file. Structures added, replaced or
+    removed since it was written (according to the modification time and inode of their
+    files) are updated and the consolidated file is written again.
+    """
+    parameters_dir = get_parameters_dir(index_dir, my_parameters)
+    structures_dir = os.path.join(parameters_dir, "structures")
+    index_file = os.path.join(parameters_dir, "index.npz")
+
+    # Modification time and inode of the file of every structure (files are replaced, not
+    # rewritten, so a new inode also shows a change within the mtime resolution)
+    files = {}
+    if os.path.isdir(structures_dir):
+        for filename in os.listdir(structures_dir):
+            if filename.endswith(".npz"):
+                try:
+                    stat = os.stat(os.path.join(structures_dir, filename))
+                    files[filename[:-4]] = (stat.st_mtime_ns, stat.st_ino)
+                except FileNotFoundError: # removed by another run
+                    pass
+
+    names = n.zeros(0, dtype=str)
+    mtimes = n.zeros((0, 2), dtype=n.int64)
+    structures = n.zeros(0, dtype=int)
+    regions = n.zeros(0, dtype=int)
+    origins = n.zeros((0, 3))
+    descriptors = n.zeros((0, 4))
+    try:
+        with n.load(index_file, allow_pickle=False) as data:
+            names, mtimes = data["names"], data["mtimes"]
+            structures, regions = data["structures"], data["regions"]
+            origins, descriptors = data["origins"], data["descriptors"]
+    except Exception: # no consolidated file yet, or unreadable: rebuild it
+        pass
+
+    up_to_date = n.array([files.get(name) == tuple(mtime) for name, mtime in zip(names, mtimes)], dtype=bool)
+    new_names = sorted(set(files) - set(names[up_to_date]))
+
+    if not up_to_date.all() or new_names:
+        sys.stderr.write("updating consolidated index... ")
+        # Keep the regions of the structures whose files did not change
+        new_position = n.cumsum(up_to_date) - 1
+        keep = up_to_date[structures]
+        names, mtimes = list(names[up_to_date]), list(mtimes[up_to_date])
+        structures, regions = [new_position[structures[keep]]], [regions[keep]]
+        origins, descriptors = [origins[keep]], [descriptors[keep]]
+
+        for name in new_names:
+            try:
+                with n.load(os.path.join(structures_dir, name + ".npz"), allow_pickle=False) as data:
+                    structures.append(n.full(len(data["origins"]), len(names), dtype=int))
+                    regions.append(n.arange(1, len(data["origins"]) + 1))
+                    origins.append(data["origins"])
+                    descriptors.append(data["descriptors"])
+            except FileNotFoundError: # removed by another run
+                continue
+            names.append(name)
+            mtimes.append(files[name])
+
+        names, mtimes = n.array(names, dtype=str), n.array(mtimes, dtype=n.int64).reshape(-1, 2)
+        structures, regions = n.concatenate(structures), n.concatenate(regions)
+        origins, descriptors = n.vstack(origins), n.vstack(descriptors)
+        if os.path.isdir(parameters_dir):
+            write_npz(index_file, names=names, mtimes=mtimes, structures=structures,
+                      regions=regions, origins=origins, descriptors=descriptors)
+
+    return names[structures], regions, origins, descriptors
+
+def search_index(index_dir, structure, my_moments, my_parameters, k, chunk_size=10000):
+    """
+    Finds, for every region of a structure, the k most similar regions of the other
+    structures stored in the index with the same parameters (dictionary). Returns a list
+    (one element per region) of lists of tuples (structure, region number, origin,
+    distance) sorted by distance. The index is compared in chunks of chunk_size regions.
+    """
+    sys.stderr.write("Searching similar regions in index %s... " %index_dir)
+    structures, regions, origins, descriptors = load_index(index_dir, my_parameters)
+    others = structures != structure
+    structures, regions = structures[others], regions[others]
+    origins, descriptors = origins[others], descriptors[others]
+
+    query = get_region_descriptors(my_moments)[1]
+    if len(descriptors) == 0 or len(query) == 0:
+        sys.stderr.write("no regions to compare.\n")
+        return [[] for i in range(len(query))]
+
+    # Standardize descriptors so all of them weigh the same in the distance
+    mean = descriptors.mean(axis=0)
+    std = descriptors.std(axis=0)
+    std[std == 0] = 1
+    descriptors = (descriptors - mean)/std
+    query = (query - mean)/std
+
+    # Squared distances |q - d|^2 = |q|^2 + |d|^2 - 2 q.d between all the query regions
+    # and a chunk of the index, merged with the k nearest regions of the previous chunks
+    k = min(k, len(descriptors))
+    query_norms = (query**2).sum(axis=1)[:, n.newaxis]
+    nearest_distances = n.full((len(query), k), n.inf)
+    nearest = n.zeros((len(query), k), dtype=int)
+    for start in range(0, len(descriptors), chunk_size):
+        chunk = descriptors[start:start + chunk_size]
+        distances = n.maximum(query_norms + (chunk**2).sum(axis=1) - 2*query.dot(chunk.T), 0)
+        distances = n.hstack((nearest_distances, distances))
+        candidates = n.hstack((nearest, n.broadcast_to(n.arange(start, start + len(chunk)), (len(query), len(chunk)))))
+        best = n.argpartition(distances, k - 1, axis=1)[:, :k]
+        nearest_distances = n.take_along_axis(distances, best, axis=1)
+        nearest = n.take_along_axis(candidates, best, axis=1)
+
+    order = n.argsort(nearest_distances, axis=1)
+    nearest = n.take_along_axis(nearest, order, axis=1)
+    nearest_distances = n.sqrt(n.take_along_axis(nearest_distances, order, axis=1))
+
+    similar = []
+    for i in range(len(query)):
+        similar.append([(structures[j], regions[j], tuple(origins[j]), distance) for j, distance in zip(nearest[i], nearest_distances[i])])
+
+    sys.stderr.write("%s regions compared.\n" %len(descriptors))
+    return similar
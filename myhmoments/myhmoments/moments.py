@@ -6,14 +6,17 @@ alpha-carbon(CA) of the surface residues. Using the distance function, the resid
 are at a distance =< of the radius are used to calculate the hydropathy moment of
 the region residues. Each hydrophobicity index of the residues is associated to a color
 using the colors module. The color resulting of the mean of all residues will be assigned
-to the hydropathy moment.
+to the hydropathy moment. The mean hydrophobicity index and the number of residues inside
+the sphere are kept together with the moment so that regions can be compared later.
 """
 
 
 try:
     import sys
     import math
-    from myhmoments.hphob_scales import hphob_scales_dict
+    import numpy as n
+    from Bio.PDB.kdtrees import KDTree
+    from myhmoments.hphob_scales import hphob_scales_dict, atomic_hphob_dict
     from myhmoments.colors import get_color
 
 except ImportError as e:
@@ -51,6 +54,8 @@ def get_H_moments(my_dictionary, my_radius, my_h_scale):
     """
     Calculates the hidrophocity moment of each region using a given hydrophobicity
     scale, a given radius, and the dictonary containing the surface residues.
+    Returns a dictionary with the sphere centers as keys and tuples
+    (Hx, Hy, Hz, color, mean H, number of residues in the sphere) as values.
     """
     sys.stderr.write("Calculating hydropathy moments... ")
     my_h_dict = hphob_scales_dict[my_h_scale]
@@ -89,7 +94,60 @@ def get_H_moments(my_dictionary, my_radius, my_h_scale):
 
       # Get color
       color = get_color(value=mean_H_constant, minimum=min_H_constant, maximum=max_H_constant, scale=my_h_scale)
-      region_moments[ca1] = (Hx, Hy, Hz, color)
+      region_moments[ca1] = (Hx, Hy, Hz, color, mean_H_constant, len(H_list))
+
+
+    sys.stderr.write("%s hydropathy moments calculated.\n" %count)
+    return region_moments
+
+def get_H_moments_atoms(my_dictionary, my_atoms, my_radius):
+    """
+    Calculates the hidrophocity moment of each region using the atomic hydrophobicity
+    scale, a given radius, the dictionary containing the sphere centers of the surface
+    residues and the atom arrays returned by get_atom_arrays. Returns a dictionary like
+    get_H_moments, where the last value is the number of residues with atoms in the sphere.
+
+    The weighted unit vectors of the atoms of each residue are divided by the maximum
+    absolute atomic hydrophobicity and by the number of atoms of that residue inside the
+    sphere, so every residue contributes at most a unit vector, as with a residue scale
+    between -1 and 1. This keeps the arrows written in the .bild file a few angstroms long.
+    """
+    sys.stderr.write("Calculating hydropathy moments from atoms... ")
+    residue_names, coordinates, atom_types, atom_names, offsets = my_atoms
+    weights = n.array([atomic_hphob_dict[atom_type] for atom_type in atom_types], dtype="d")
+    atom_residues = n.repeat(n.arange(len(residue_names)), n.diff(offsets)) # residue index of every atom
+    max_H_constant = max(atomic_hphob_dict.values())
+    min_H_constant = min(atomic_hphob_dict.values())
+    max_abs_H_constant = max(abs(value) for value in atomic_hphob_dict.values())
+
+    count = 0
+    region_moments = {}
+    if len(coordinates) == 0:
+      sys.stderr.write("%s hydropathy moments calculated.\n" %count)
+      return region_moments
+
+    tree = KDTree(coordinates, 10)
+
+    for aa1, center in my_dictionary.items(): # get the center of the sphere
+      inside = n.array([point.index for point in tree.search(n.array(center, dtype="d"), my_radius)], dtype=int)
+      if len(inside) == 0:
+        continue
+      count +=1
+
+      # unit vectors from the center to every atom inside the sphere, weighted by the atomic H
+      vectors = coordinates[inside] - n.array(center, dtype="d")
+      modules = n.sqrt((vectors**2).sum(axis=1))
+      modules[modules == 0] = 1
+      residues, atoms_residue, atoms_number = n.unique(atom_residues[inside], return_inverse=True, return_counts=True)
+      residues_number = len(residues)
+      normalization = max_abs_H_constant * atoms_number[atoms_residue] # per atom: max |H| * atoms of its residue
+      Hx, Hy, Hz = ((vectors/modules[:, n.newaxis]) * (weights[inside]/normalization)[:, n.newaxis]).sum(axis=0)
+
+      mean_H_constant = weights[inside].mean()
+
+      # Get color
+      color = get_color(value=mean_H_constant, minimum=min_H_constant, maximum=max_H_constant, scale="Eisenberg_McLachlan")
+      region_moments[center] = (Hx, Hy, Hz, color, mean_H_constant, residues_number)
 
 
     sys.stderr.write("%s hydropathy moments calculated.\n" %count)
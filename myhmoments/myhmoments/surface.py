@@ -4,14 +4,21 @@ This module uses Biopython modules PDB.Parser and PDB.DSSP to process a given PD
 The get_surface_residues function returns a set containing the number of those residues in the surface
 and the get_CA_coordinates function returns a dictonary with their alpha-carbon coordinates. This
 dictionary will be used to center the region when calculating hydropathy moment.
+
+The get_atom_arrays function stores the atoms of the surface residues in arrays (coordinates,
+atom types and names) with an index of the first atom of each residue, and the
+get_centroid_coordinates function uses them to return the same dictionary as get_CA_coordinates
+with the side-chain centroids instead.
 """
 
 
 import sys
 
 try:
+    import numpy as n
     from Bio.PDB.PDBParser import PDBParser
     from Bio.PDB.DSSP import DSSP
+    from myhmoments.hphob_scales import atomic_hphob_dict, charged_atoms_dict
 except ImportError as e:
     raise Exception("Failed to import %s\n" %e)
 
@@ -65,3 +72,79 @@ def get_CA_coordinates(filename, my_set):
                         CA = atom.get_coord()
                 CA_coordinates[residue_number] = tuple(CA)
     return CA_coordinates
+
+
+def get_atom_arrays(filename, my_set):
+    """
+    Given a pdb file, it stores the atoms of those residues that are in the surface (set)
+    in compact arrays. Returns the list of residue names, an array with the atom coordinates,
+    an array with the atom types of the atomic hydrophobicity scale, an array with the atom
+    names and an array of offsets: the atoms of residue i are those between offsets[i] and
+    offsets[i+1]. Atoms not in the atomic hydrophobicity scale (e.g. hydrogens) are not stored.
+    """
+    p = PDBParser(PERMISSIVE=1)
+    s = p.get_structure("code.pdb", filename)
+    model = s[0]
+
+    residue_names = []
+    coordinates = []
+    atom_types = []
+    atom_names = []
+    offsets = [0]
+
+    sys.stderr.write("Storing atoms of residues...\n")
+    for chain in model:
+        for residue in chain:
+            residue_name =str(residue.get_full_id()[3][1]) + residue.get_full_id()[2]
+            if residue.get_id()[0] == " " and residue_name in my_set:
+                charged_atoms = charged_atoms_dict.get(residue.get_resname(), {})
+                for atom in residue:
+                    atom_type = charged_atoms.get(atom.get_name(), atom.element)
+                    if atom_type in atomic_hphob_dict:
+                        coordinates.append(atom.get_coord())
+                        atom_types.append(atom_type)
+                        atom_names.append(atom.get_name())
+                residue_names.append(str(residue.get_resname())+str(residue.get_id()[1]))
+                offsets.append(len(coordinates))
+
+    sys.stderr.write("%s atoms of %s residues stored.\n" %(len(coordinates), len(residue_names)))
+    return (residue_names,
+            n.array(coordinates, dtype="d").reshape(-1, 3),
+            n.array(atom_types, dtype=str),
+            n.array(atom_names, dtype=str),
+            n.array(offsets, dtype=int))
+
+
+def get_centroid_coordinates(my_atoms):
+    """
+    Given the atom arrays returned by get_atom_arrays, it creates a dictionary with the
+    side-chain centroid coordinates of the residues. Residues without side-chain
+    (glycine or incomplete residues) use the CA coordinates.
+    """
+    residue_names, coordinates, atom_types, atom_names, offsets = my_atoms
+    sys.stderr.write("Calculating side-chain centroid coordinates of residues...\n")
+
+    # offsets of the side-chain atoms of every residue among the side-chain atoms
+    side_chain = ~n.isin(atom_names, ["N", "CA", "C", "O", "OXT"])
+    side_chain_offsets = n.concatenate(([0], n.cumsum(side_chain)))[offsets]
+    side_chain_numbers = n.diff(side_chain_offsets)
+
+    # sum the side-chain coordinates of the residues with side-chain (reduceat needs
+    # non-empty slices; those of consecutive residues with side-chain are contiguous)
+    with_side_chain = side_chain_numbers > 0
+    centroids = n.zeros((len(residue_names), 3))
+    if with_side_chain.any():
+        centroids[with_side_chain] = n.add.reduceat(coordinates[side_chain], side_chain_offsets[:-1][with_side_chain], axis=0)
+        centroids[with_side_chain] /= side_chain_numbers[with_side_chain, n.newaxis]
+
+    # CA of the residues without side-chain
+    is_CA = n.flatnonzero(atom_names == "CA")
+    CA_residues = n.searchsorted(offsets, is_CA, side="right") - 1 # residue index of every CA
+    with_CA = n.zeros(len(residue_names), dtype=bool)
+    with_CA[CA_residues] = True
+    centroids[CA_residues[~with_side_chain[CA_residues]]] = coordinates[is_CA[~with_side_chain[CA_residues]]]
+
+    centroid_coordinates = {}
+    for i in n.flatnonzero(with_side_chain | with_CA):
+        centroid_coordinates[residue_names[i]] = tuple(centroids[i])
+    return centroid_coordinates
@@ -1,11 +1,16 @@
+import re
 from setuptools import setup
 
 def readme():
     with open('README.rst') as f:
         return f.read()
 
+def version():
+    with open('myhmoments/__init__.py') as f:
+        return re.search(r"__version__ = '(.*)'", f.read()).group(1)
+
 setup(name='myhmoments',
-      version='0.1',
+      version=version(),
       description='Calculator of hydropathy moments in surface regions of biomolecules',
       long_description=readme(),
       classifiers=[
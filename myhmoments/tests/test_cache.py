@@ -0,0 +1,74 @@
+"""
+Tests for the cache module: a result read from the cache must write the same output
+files as the run that stored it.
+"""
+
+import os
+import tempfile
+import unittest
+
+import numpy as n
+
+from myhmoments.cache import get_cached_moments, store_moments
+from myhmoments.moments import get_H_moments
+
+
+def write_results(my_moments, prefix):
+    """
+    Writes the moments table and the .bild arrows with the same formats as __main__.
+    """
+    with open(prefix + ".tab", "w") as outfd:
+        count = 1
+        for key, value in my_moments.items():
+            outfd.write("%8s\t%8.4f\t%8.4f\t%8.4f\t%8.4f\t%8.4f\t%8.4f\n" %(count,key[0],key[1],key[2],value[0],value[1],value[2]))
+            count+=1
+
+    with open(prefix + ".bild", "w") as outfd_moments:
+        for key, value in my_moments.items():
+            if value[0]!= 0 and value[1]!= 0 and value[2]!= 0:
+                outfd_moments.write(".color %f %f %f\n" %(value[3][0], value[3][1], value[3][2]))
+                outfd_moments.write(".arrow %f %f %f %f %f %f\n" %(key[0],key[1],key[2],key[0]+value[0],key[1]+value[1],key[2]+value[2]))
+
+
+class CacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.cache_dir = os.path.join(self.tmp_dir.name, "cache")
+
+        # float32 coordinates, as returned by Bio.PDB atom.get_coord()
+        random = n.random.RandomState(0)
+        residues = ["ALA", "ARG", "LEU", "ASP", "PHE", "SER", "ILE", "GLU"]
+        coordinates = (random.rand(40, 3) * 15).astype(n.float32)
+        self.CA_dictionary = dict(("%s%s" %(residues[i % len(residues)], i), tuple(coordinates[i])) for i in range(40))
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def read(self, filename):
+        with open(filename, "rb") as fd:
+            return fd.read()
+
+    def test_hit_writes_same_files(self):
+        moments = get_H_moments(my_dictionary=self.CA_dictionary, my_radius=6.0, my_h_scale="Kyte_Doolitle")
+        self.assertIsNone(get_cached_moments(self.cache_dir, "key"))
+        store_moments(self.cache_dir, "key", moments, max_size=1024*1024)
+        cached_moments = get_cached_moments(self.cache_dir, "key")
+
+        miss = os.path.join(self.tmp_dir.name, "miss")
+        hit = os.path.join(self.tmp_dir.name, "hit")
+        write_results(moments, miss)
+        write_results(cached_moments, hit)
+        self.assertEqual(self.read(miss + ".tab"), self.read(hit + ".tab"))
+        self.assertEqual(self.read(miss + ".bild"), self.read(hit + ".bild"))
+
+    def test_unreadable_result_is_a_miss(self):
+        os.makedirs(self.cache_dir)
+        with open(os.path.join(self.cache_dir, "key.npz"), "wb") as fd:
+            fd.write(b"not a npz file")
+        self.assertIsNone(get_cached_moments(self.cache_dir, "key"))
+        self.assertFalse(os.path.exists(os.path.join(self.cache_dir, "key.npz")))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,75 @@
+"""
+Tests for the index module: the chunked search must find the same regions as a full
+comparison, and the consolidated file must follow the structures added or replaced.
+"""
+
+import os
+import tempfile
+import unittest
+
+import numpy as n
+
+from myhmoments.index import add_to_index, load_index, search_index, get_region_descriptors
+
+
+def random_moments(random, number):
+    """
+    Returns a dictionary like the one returned by get_H_moments with random values.
+    """
+    moments = {}
+    for i in range(number):
+        origin = tuple((random.rand(3) * 30).astype(n.float32))
+        moments[origin] = (random.randn(), random.randn(), random.randn(), (1.0, 0.0, 0.0), random.randn(), random.randint(1, 10))
+    return moments
+
+
+class IndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.index_dir = self.tmp_dir.name
+        self.parameters = {"radius": 6.0, "hphob_scale": "Kyte_Doolitle"}
+        self.random = n.random.RandomState(0)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_chunked_search_is_exact(self):
+        for i in range(5):
+            add_to_index(self.index_dir, "structure%s" %i, random_moments(self.random, 30), self.parameters)
+        query = random_moments(self.random, 12)
+
+        similar = search_index(self.index_dir, "query", query, self.parameters, k=4, chunk_size=7)
+
+        # Full comparison of the standardized descriptors
+        descriptors = load_index(self.index_dir, self.parameters)[3]
+        mean, std = descriptors.mean(axis=0), descriptors.std(axis=0)
+        distances = n.sqrt(((((get_region_descriptors(query)[1] - mean)/std)[:, n.newaxis] - (descriptors - mean)/std)**2).sum(axis=2))
+        for region, hits in zip(distances, similar):
+            self.assertTrue(n.allclose([hit[3] for hit in hits], n.sort(region)[:4]))
+
+    def test_search_excludes_structure_and_parameters(self):
+        add_to_index(self.index_dir, "query", random_moments(self.random, 10), self.parameters)
+        add_to_index(self.index_dir, "other", random_moments(self.random, 10), {"radius": 8.0})
+        similar = search_index(self.index_dir, "query", random_moments(self.random, 3), self.parameters, k=2)
+        self.assertEqual(similar, [[], [], []])
+
+    def test_consolidated_index_is_updated(self):
+        add_to_index(self.index_dir, "a", random_moments(self.random, 4), self.parameters)
+        add_to_index(self.index_dir, "b", random_moments(self.random, 6), self.parameters)
+        self.assertEqual(sorted(set(load_index(self.index_dir, self.parameters)[0])), ["a", "b"])
+
+        add_to_index(self.index_dir, "a", random_moments(self.random, 2), self.parameters)
+        add_to_index(self.index_dir, "c", random_moments(self.random, 3), self.parameters)
+        structures, regions = load_index(self.index_dir, self.parameters)[0:2]
+        self.assertEqual(sorted(structures), ["a"] * 2 + ["b"] * 6 + ["c"] * 3)
+        self.assertEqual(sorted(regions[structures == "a"]), [1, 2])
+
+        parameters_dir = os.path.dirname(os.path.dirname(
+            [os.path.join(root, f) for root, dirs, files in os.walk(self.index_dir) for f in files if f == "b.npz"][0]))
+        os.remove(os.path.join(parameters_dir, "structures", "b.npz"))
+        self.assertEqual(sorted(set(load_index(self.index_dir, self.parameters)[0])), ["a", "c"])
+
+
+if __name__ == "__main__":
+    unittest.main()